@@ -30,24 +30,56 @@ with open("llm_system_prompt.md", "r", encoding = 'utf-8') as f:
     system_prompt = f.read()
     logging.info(f"system prompt to use -- \n{system_prompt}")
 app = Flask(__name__)
+capture_name_pattern = re.compile(r'(\d{8})_(\d{6})(?:_([A-Za-z0-9-]+)$)?')  # yyyymmdd_HHMMSS[_device]
 
 
-def choose_nearest_one(file_names: list[str]) -> str:
+def parse_capture_filename(filename: str) -> tuple[datetime, str | None] | None:
+    """
+    ファイル名 yyyymmdd_HHMMSS[_<device>] から撮影日時とデバイスタグを取り出す
+    日時はファイル名中の任意の位置から検索する（例: IMG_20250101_000000-1.jpeg）
+    デバイスタグは日時の直後で末尾にある場合のみ認識し、それ以外はデバイスNoneとして扱う
+
+    Args:
+        filename: ファイル名
+
+    Returns:
+        (撮影日時, デバイスタグ)。フォーマットに合わない場合はNone
+    """
+    # ファイル名から拡張子を除いた部分を取得
+    name_without_ext = filename.rsplit('.', 1)[0] if '.' in filename else filename
+
+    # 日時パターンを検索
+    match = capture_name_pattern.search(name_without_ext)
+    if not match:
+        return None
+    date_str = match.group(1)  # yyyymmdd
+    time_str = match.group(2)    # HHMMSS
+    try:
+        # 日時をパース
+        file_datetime = datetime.strptime(f"{date_str}_{time_str}", "%Y%m%d_%H%M%S")
+    except ValueError as e:
+        logger.warning(f"Could not parse datetime from filename {filename}: {str(e)}")
+        return None
+    return file_datetime, match.group(3)
+
+
+def choose_nearest_one(file_names: list[str], device: str | None = None) -> str:
     """
     FTPディレクトリ内のファイルリストから、現在時刻より過去で最も現在に近いファイルを選択する
-    ファイル名は yyyymmdd_HHMMSS フォーマットであることを前提とする
+    ファイル名は yyyymmdd_HHMMSS[_<device>] フォーマットであることを前提とする
     
     Args:
-        file_names: ファイル名のリスト（yyyymmdd_HHMMSS形式）
-        ftp: FTP接続オブジェクト（未使用だが互換性のため保持）
+        file_names: ファイル名のリスト（yyyymmdd_HHMMSS[_<device>]形式）
+        device: 対象とするデバイスタグ（例: csi0, video0）。Noneの場合は全デバイスが対象
     
     Returns:
         現在時刻より過去で最も現在に近いファイル名
+        同時刻のファイルが複数ある場合はデバイスタグの昇順で先頭のもの（タグなしが最優先）
     """
     if not file_names:
         raise ValueError("File list is empty")
     
-    if len(file_names) == 1:
+    if len(file_names) == 1 and device is None:
         return file_names[0]
     
     # 現在時刻を取得
@@ -55,34 +87,24 @@ def choose_nearest_one(file_names: list[str]) -> str:
     
     # ファイル名から日時を抽出して、過去のファイルのみをフィルタリング
     past_files = []
-    date_pattern = re.compile(r'(\d{8})_(\d{6})')  # yyyymmdd_HHMMSS
-    
     for filename in file_names:
-        # ファイル名から拡張子を除いた部分を取得
-        name_without_ext = filename.rsplit('.', 1)[0] if '.' in filename else filename
-        
-        # 日時パターンを検索
-        match = date_pattern.search(name_without_ext)
-        if match:
-            date_str = match.group(1)  # yyyymmdd
-            time_str = match.group(2)    # HHMMSS
-            
-            try:
-                # 日時をパース
-                file_datetime = datetime.strptime(f"{date_str}_{time_str}", "%Y%m%d_%H%M%S")
-                
-                # 現在時刻より過去のファイルのみを対象とする
-                if file_datetime < now:
-                    past_files.append((filename, file_datetime))
-            except ValueError as e:
-                logger.warning(f"Could not parse datetime from filename {filename}: {str(e)}")
-                continue
+        parsed = parse_capture_filename(filename)
+        if parsed is None:
+            continue
+        file_datetime, file_device = parsed
+        if device is not None and file_device != device:
+            continue
+        # 現在時刻より過去のファイルのみを対象とする
+        if file_datetime < now:
+            past_files.append((filename, file_datetime, file_device or ""))
     
     if not past_files:
-        raise ValueError("No valid past files found in the list")
+        raise ValueError(f"No valid past files found in the list for device {device}" if device else "No valid past files found in the list")
     
-    # 日時でソート（新しい順）
-    past_files.sort(key=lambda x: x[1], reverse=True)
+    # 日時でソート（新しい順）。同時刻はデバイスタグ順で固定する
+    past_files.sort(key=lambda x: (-x[1].timestamp(), x[2]))
+    if device is None and len(past_files) > 1 and past_files[0][1] == past_files[1][1]:
+        logger.warning(f"Multiple devices captured at {past_files[0][1]}; pass 'device' to choose one explicitly")
     
     # 最も現在に近い（最新の）ファイルを返す
     chosen_file = past_files[0][0]
@@ -116,6 +138,9 @@ def get_status():
 def analyze_image_endpoint():
     """Analyze image endpoint"""
     try:
+        # 対象デバイス（任意）。指定がなければ全デバイスから最新のものを選ぶ
+        req_body = request.get_json(silent=True) or {}
+        device = req_body.get('device')
         # FTP接続
         logger.info(f"Connecting to FTP server: {ftp_user}{ftp_host}")
         with FTP(ftp_host) as ftp:
@@ -137,7 +162,7 @@ def analyze_image_endpoint():
             logger.info(f"Found {len(file_list)} files in tempmon_incoming")
 
             try:
-                nearest_one = choose_nearest_one(file_list)
+                nearest_one = choose_nearest_one(file_list, device)
                 logger.info(f"chosen file to process is {nearest_one}")
 
                 # 一時ディレクトリを作成
@@ -197,6 +222,7 @@ def analyze_image_endpoint():
                     
                     return jsonify({
                         'status': 'success',
+                        'file': nearest_one,
                         'data': parsed_data
                     }), 200
                 except json.JSONDecodeError as je:
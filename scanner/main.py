@@ -8,6 +8,8 @@ from loguru import logger
 from datetime import datetime
 import traceback
 import subprocess
+import re
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import cloudinary
 import cloudinary.uploader
@@ -155,6 +157,128 @@ class CameraCapture:
         cap.release()
         return ret
 
+    @property
+    def tag(self) -> str:
+        """ファイル名に付与するデバイスタグ（例: video0）。"""
+        return f"video{self.device}"
+
+
+class RpiCameraCapture:
+    """
+    rpicam-jpegを使ってCSIカメラから一度だけ画像をキャプチャするクラス。
+    """
+
+    def __init__(self, camera: int = 0, timeout: int = 30):
+        """
+        CSIカメラを初期化。
+
+        Parameters
+        ----------
+        camera : int
+            rpicam-jpeg の --camera に渡すカメラ番号（デフォルトは0）。
+        timeout : int
+            rpicam-jpeg の実行タイムアウト秒数（デフォルトは30）。
+        """
+        self.camera = camera
+        self.timeout = timeout
+
+    def capture_once(self, save_path: str | Path) -> bool:
+        """
+        CSIカメラから一度だけ画像をキャプチャして保存。
+
+        Parameters
+        ----------
+        save_path : str or pathlib.Path
+            保存先のファイルパス。
+
+        Returns
+        -------
+        bool
+            キャプチャが成功したかどうか。
+        """
+        logger.info(f"writing capture image to ${save_path} ...")
+        try:
+            rez = subprocess.run(
+                ["rpicam-jpeg", "--camera", str(self.camera), "-o", str(save_path)],
+                check = False,
+                timeout = self.timeout
+            )
+        except subprocess.TimeoutExpired:
+            logger.error(f"rpicam-jpeg timed out for camera {self.camera} after {self.timeout}s")
+            return False
+        if rez.returncode != 0:
+            logger.error(f"rpicam-jpeg failed for camera {self.camera} (code: {rez.returncode})")
+            return False
+        logger.info(f"writing capture image done.")
+        return True
+
+    @property
+    def tag(self) -> str:
+        """ファイル名に付与するデバイスタグ（例: csi0）。"""
+        return f"csi{self.camera}"
+
+
+def parse_camera_spec(spec: str) -> CameraCapture | RpiCameraCapture:
+    """
+    カメラ指定文字列からキャプチャオブジェクトを生成する。
+
+    Parameters
+    ----------
+    spec : str
+        "csiN"（CSIカメラ）、"videoN" または "/dev/videoN"（V4L2デバイス）。
+
+    Returns
+    -------
+    CameraCapture or RpiCameraCapture
+        指定に対応するキャプチャオブジェクト。
+    """
+    m = re.fullmatch(r"(csi|(?:/dev/)?video)(\d+)", spec.strip())
+    if m is None:
+        raise ValueError(f"Invalid camera spec: {spec}")
+    if m.group(1) == "csi":
+        return RpiCameraCapture(int(m.group(2)))
+    return CameraCapture(int(m.group(2)))
+
+
+def parse_camera_specs(specs: str) -> list[CameraCapture | RpiCameraCapture]:
+    """
+    カンマ区切りのカメラ指定（例: "csi0,csi1,video0"）をパースする。
+    同じデバイスが重複して指定された場合はエラーとする。
+    """
+    cameras = [parse_camera_spec(spec) for spec in specs.split(",") if spec.strip()]
+    if not cameras:
+        raise ValueError("No camera is specified.")
+    tags = [camera.tag for camera in cameras]
+    if len(set(tags)) != len(tags):
+        raise ValueError(f"Duplicated camera spec: {specs}")
+    return cameras
+
+
+def capture_all(cameras: list[CameraCapture | RpiCameraCapture],
+                img_dir: Path, ts: str) -> list[tuple[str, str, Path]]:
+    """
+    全カメラで同時にキャプチャを行い、成功したものを返す。
+    ファイル名は yyyymmdd_HHMMSS_<device tag>.jpeg とする。
+
+    Returns
+    -------
+    list of (device tag, file name, local path)
+        キャプチャに成功したデバイスのみ。指定順を維持する。
+    """
+    def _capture(camera) -> tuple[str, str, Path] | None:
+        fname = f"{ts}_{camera.tag}.jpeg"
+        img_path_obj = img_dir / fname
+        try:
+            if camera.capture_once(img_path_obj):
+                return (camera.tag, fname, img_path_obj)
+        except Exception as e:
+            logger.error(f"capture failed on {camera.tag}: {traceback.format_exc()}")
+        return None
+
+    with ThreadPoolExecutor(max_workers=len(cameras)) as executor:
+        results = list(executor.map(_capture, cameras))
+    return [r for r in results if r is not None]
+
 def str_to_bool(s: str) -> bool:
     true_set = {"y", "yes", "t", "true", "on", "1"}
     false_set = {"n", "no", "f", "false", "off", "0"}
@@ -199,61 +323,71 @@ def main():
         n8n_integ = str_to_bool(n8n_integ_t)
     
 
-    # STEP1. Capture the camera and save the image to SCANNED_IMG_PATH
-    fname = f"{now_str()}.jpeg"
-    img_path_obj = Path(img_path) / fname
-    try:
-        rez = subprocess.run(
-            ["rpicam-jpeg", "-o", str(img_path_obj)],
-            check = True
-        )
-    except Exception as e:
-        raise RuntimeError(e)
+    cameras = parse_camera_specs(getenv("TEMPMON_CAMERAS", "csi0"))
+
+    # STEP1. Capture all the cameras concurrently and save the images to SCANNED_IMG_PATH
+    captures = capture_all(cameras, Path(img_path), now_str())
+    if not captures:
+        raise RuntimeError(f"couldn't capture image from any of {[c.tag for c in cameras]}")
 
-    # STEP2. FTP the scanned image binary to blob store
+    # STEP2. FTP the scanned image binaries to blob store over a single connection
 
+    uploaded: set[str] = set()
     try:
         logger.info(f"preparing FTP to {ftp_host}@{ftp_userid}...")
-        ftp_cl:FtpClient = FtpClientImpl(ftp_host ,ftp_userid, ftp_passwd)
-        ftp_cl._connect()
-        if not ftp_cl._is_connected():
-            raise RuntimeError("FTP connection not established")
-        logger.info("FTP connection established. Uploading file ..")
-        ftp_cl.upload_file(str(img_path_obj), f"tempmon_incoming/{fname}")
-        ftp_cl.upload_file(str(img_path_obj), f"tempmon_keep/{fname}")
-        ftp_cl.close()
-        logger.info(f"Uploading file to tempmon_incoming/{fname} done.")
+        with FtpClientImpl(ftp_host ,ftp_userid, ftp_passwd) as ftp_cl:
+            if not ftp_cl._is_connected():
+                raise RuntimeError("FTP connection not established")
+            logger.info("FTP connection established. Uploading file ..")
+            for device, fname, img_path_obj in captures:
+                try:
+                    ftp_cl.upload_file(str(img_path_obj), f"tempmon_incoming/{fname}")
+                    ftp_cl.upload_file(str(img_path_obj), f"tempmon_keep/{fname}")
+                    uploaded.add(device)
+                    logger.info(f"Uploading file to tempmon_incoming/{fname} done.")
+                except Exception as e:
+                    logger.error(f"FTP upload failed on {device}: {traceback.format_exc()}")
     except Exception as e:
         logger.error(traceback.format_exc())
 
-    # STEP3. Upload the image to Cloudinary
+    # STEP3. Upload the images to Cloudinary
+    urls: dict[str, str | None] = {device: None for device, _, _ in captures}
     try:
-        logger.info(f"Uploading file to Cloudinary...")
         cloudinary_cl:CloudinaryClient = CloudinaryClient(cloudinary_cloud_name, cloudinary_api_key, cloudinary_api_secret)
-        url = cloudinary_cl.upload_file(str(img_path_obj))
-        logger.info(f"Uploading file to Cloudinary done. URL: {url}")
+        for device, fname, img_path_obj in captures:
+            try:
+                logger.info(f"Uploading file {fname} to Cloudinary...")
+                urls[device] = cloudinary_cl.upload_file(str(img_path_obj))
+                logger.info(f"Uploading file to Cloudinary done. URL: {urls[device]}")
+            except Exception as e:
+                logger.error(traceback.format_exc())
     except Exception as e:
         logger.error(traceback.format_exc())
 
-    # 3. fire & forget N8N analysis flow if integration flag is ON
+    # 3. fire & forget N8N analysis flow per device if integration flag is ON
+    #    (only for devices whose image reached tempmon_incoming)
     if n8n_integ:
-        # tempmon_n2n_webhookにHTTP POSTリクエストを送信
-        try:
-            logger.info(f"Sending POST request to {tempmon_n2n_webhook}...")
-            response = requests.post(
-                tempmon_n2n_webhook,
-                json={"filename": fname, "image_path": str(img_path_obj), "cloudinary_url": url},
-                headers={'Content-Type': 'application/json'},
-                timeout=60
-            )
-            logger.info(f"HTTP POST response code: {response.status_code}")
-            logger.info(f"HTTP POST response headers: {dict(response.headers)}")
-            logger.info(f"HTTP POST response content: {response.text}")
-            if response.status_code == 405:
-                logger.error(f"405 Method Not Allowed - n8nのwebhookがPOSTメソッドを受け付けていません。URLを確認してください: {tempmon_n2n_webhook}")
-        except Exception as e:
-            logger.error(f"Failed to send POST request to {tempmon_n2n_webhook}: {str(e)}")
-            logger.error(traceback.format_exc())
+        for device, fname, img_path_obj in captures:
+            if device not in uploaded:
+                logger.warning(f"Skipping N8N analysis flow for {device}: FTP upload failed.")
+                continue
+            # tempmon_n2n_webhookにHTTP POSTリクエストを送信
+            try:
+                logger.info(f"Sending POST request for {device} to {tempmon_n2n_webhook}...")
+                response = requests.post(
+                    tempmon_n2n_webhook,
+                    json={"filename": fname, "device": device, "image_path": str(img_path_obj), "cloudinary_url": urls[device]},
+                    headers={'Content-Type': 'application/json'},
+                    timeout=60
+                )
+                logger.info(f"HTTP POST response code: {response.status_code}")
+                logger.info(f"HTTP POST response headers: {dict(response.headers)}")
+                logger.info(f"HTTP POST response content: {response.text}")
+                if response.status_code == 405:
+                    logger.error(f"405 Method Not Allowed - n8nのwebhookがPOSTメソッドを受け付けていません。URLを確認してください: {tempmon_n2n_webhook}")
+            except Exception as e:
+                logger.error(f"Failed to send POST request to {tempmon_n2n_webhook}: {str(e)}")
+                logger.error(traceback.format_exc())
     else:
         logger.info("N8N integration is OFF. Skipping N8N analysis flow.")
 